@@ -1,9 +1,67 @@
 import subprocess
 import abc
-import time
+import copy
 import threading
 import os
 import signal
+import collections
+import locale
+import re
+import hashlib
+import time
+import weakref
+from typing import Iterator
+
+# Characters which cannot be used in file names on Windows or POSIX.
+_UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*\s\x00-\x1f]')
+# Tags longer than this are shortened and made unique with a hash.
+_MAX_TAG_LENGTH = 100
+# Return codes of a process that was interrupted: by a signal, by SIGINT on POSIX 
+# and by a CTRL-C or CTRL-BREAK event on Windows.
+_INTERRUPTED_RETURN_CODES = frozenset({2, -signal.SIGINT, 0xC000013A})
+# Interrupts within this many seconds of the last one are treated as the same interrupt.
+_SIGINT_DEBOUNCE = 0.5
+
+# The runners stopped by a keyboard interrupt, runners are dropped once they are garbage collected.
+_runners: 'weakref.WeakSet[Runner]' = weakref.WeakSet()
+_last_sigint = None
+# The handler which was installed before _sigint_handler, it is still called on an interrupt.
+_previous_sigint = None
+# Incremented whenever an argument of a staged run is set, its hash changes with its arguments.
+_staged_run_changes = 0
+
+def _sigint_handler(signum, frame) -> None:
+    """
+    Handler for the keyboard interrupt signal, stops every runner and then 
+    calls the handler it replaced. Repeated interrupts in quick succession are 
+    only handled once.
+    """
+
+    global _last_sigint
+    now = time.monotonic()
+    if _last_sigint is not None and now - _last_sigint < _SIGINT_DEBOUNCE:
+        return
+    _last_sigint = now
+
+    for runner in list(_runners):
+        runner._signal_handler(signum, frame)
+
+    # Python's own handler raises KeyboardInterrupt, the runners are stopped instead.
+    previous = _previous_sigint
+    if callable(previous) and previous is not signal.default_int_handler:
+        previous(signum, frame)
+
+def _register_runner(runner: 'Runner') -> None:
+    """
+    Register a runner to be stopped by a keyboard interrupt, installing the handler if needed.
+    """
+
+    global _previous_sigint
+    _runners.add(runner)
+    handler = signal.getsignal(signal.SIGINT)
+    if handler is not _sigint_handler:
+        _previous_sigint = handler
+        signal.signal(signal.SIGINT, _sigint_handler)
 
 class RunnerError(Exception):
     pass
@@ -12,22 +70,58 @@ class Parameters:
     """
     The parameters of the model.
 
+    The parameters are stored in a single dictionary and are accessible as attributes.
+
     Parameters:
         clone (Parameters): A Parameters object to clone.
         **kwargs: The parameters.
     """
 
+    __slots__ = ('_args', '_version')
+
     def __init__(self, clone: 'Parameters'=None, **kwargs):
-        if clone is not None:
-            self.__dict__ = clone.__dict__.copy()
-        
-        self.__dict__.update(kwargs)
+        # The clone and the new parameters are merged into a single new dictionary.
+        self._args = {**clone._args, **kwargs} if clone is not None else kwargs
+        # Incremented whenever a parameter is set, invalidates values derived from the parameters.
+        self._version = 0
+
+    def __getattr__(self, name: str):
+        # Only called when the normal lookup fails, private names are never parameters.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._args[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+    def __setattr__(self, name: str, value) -> None:
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            self._args[name] = value
+            self._version += 1
+
+    def __copy__(self) -> 'Parameters':
+        new = self._empty_copy()
+        new._args = self._args.copy()
+        return new
+
+    def __deepcopy__(self, memo: dict) -> 'Parameters':
+        new = self._empty_copy()
+        memo[id(self)] = new
+        new._args = copy.deepcopy(self._args, memo)
+        return new
+
+    @property
+    def __dict__(self) -> dict:
+        # The parameters are slotted, vars() and __dict__ still return them.
+        return self._args
 
     def __str__(self) -> str:
-        return str(self.__dict__)
+        return str(self._args)
     
     def __repr__(self) -> str:
-        return str(self.__dict__)
+        return str(self._args)
     
     def get_params(self):
         """
@@ -36,7 +130,7 @@ class Parameters:
         Returns:
             dict: A dictionary of the set parameters.
         """
-        return self.__dict__
+        return self._args
     
     @abc.abstractmethod
     def get_run_args(self) -> list[str]:
@@ -56,44 +150,169 @@ class Parameters:
             bool: True if the required parameters have been set, False otherwise.
         """
 
-        return set(required).issubset(set(self.__dict__.keys()))
+        return set(required).issubset(set(self._args.keys()))
+
+    def _cache_key(self) -> tuple:
+        """
+        Returns a key which changes whenever values derived from the parameters,
+        such as the command of a run, may have changed.
+
+        Returns:
+            tuple: The key.
+        """
+
+        return (self._version,)
+
+    def _empty_copy(self) -> 'Parameters':
+        """
+        Create a new object of the same class for a copy, without any parameters 
+        and with the values derived from the parameters cleared.
+
+        Returns:
+            Parameters: The new object, its parameters are set by the caller.
+        """
+
+        new = type(self).__new__(type(self))
+        new._version = 0
+        return new
 
 
 class Run:
     """
     A single run of a model.
 
+    The run arguments are stored in a single dictionary and are accessible as attributes.
+
     Parameters:
         clone (Run): A Run object to clone.
         **kwargs: The run arguments.
     """
 
+    __slots__ = ('_args', '_hash', '_tag', '_staged')
+
     def __init__(self, clone: 'Run'=None, **kwargs) -> None:
-        if clone is not None: 
-            self.__dict__ = clone.__dict__.copy()
-        
-        self.__dict__.update(kwargs)
+        if clone is not None:
+            self._args = {**clone._args, **kwargs}
+            # An unchanged clone hashes the same as the original.
+            self._hash = None if kwargs else clone._hash
+        else:
+            self._args = kwargs
+            self._hash = None
+        self._tag = None
+        # Set once the run is staged to a runner.
+        self._staged = False
+
+    def __getattr__(self, name: str):
+        # Only called when the normal lookup fails, private names are never arguments.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._args[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+    def __setattr__(self, name: str, value) -> None:
+        global _staged_run_changes
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            self._args[name] = value
+            self._hash = None
+            self._tag = None
+            if self._staged:
+                # The runners it is staged to look it up by its hash, they rebuild their sets.
+                _staged_run_changes += 1
+
+    def __copy__(self) -> 'Run':
+        new = self._empty_copy()
+        new._args = self._args.copy()
+        return new
+
+    def __deepcopy__(self, memo: dict) -> 'Run':
+        new = self._empty_copy()
+        memo[id(self)] = new
+        new._args = copy.deepcopy(self._args, memo)
+        return new
+
+    @property
+    def __dict__(self) -> dict:
+        # The arguments are slotted, vars() and __dict__ still return them.
+        return self._args
 
     def __eq__(self, __value: object) -> bool:
         if not isinstance(__value, Run):
             return False
         
-        return self.__dict__ == __value.__dict__
+        if self is __value:
+            return True
+        
+        # Runs with different cached hashes cannot be equal, skip comparing the arguments.
+        if self._hash is not None and __value._hash is not None and self._hash != __value._hash:
+            return False
+        
+        return self._args == __value._args
+
+    def __hash__(self) -> int:
+        # Cached, it is reset when an argument is set as an attribute.
+        if self._hash is None:
+            try:
+                self._hash = hash(frozenset(self._args.items()))
+            except TypeError:
+                # Unhashable argument values, equal runs still share the same keys.
+                self._hash = hash(frozenset(self._args.keys()))
+        return self._hash
     
     def __str__(self) -> str:
-        return str(self.__dict__)
+        return str(self._args)
     
     def __repr__(self) -> str:
-        return str(self.__dict__)
+        return str(self._args)
     
     def get_args(self) -> dict:
         """
-        Return the run arguments.
+        Return the run arguments. The arguments should not be changed through 
+        the returned dictionary, set them as attributes instead.
 
         Returns:
             dict: A dictionary of the run arguments.
         """
-        return self.__dict__
+        return self._args
+
+    def get_tag(self) -> str:
+        """
+        Return a short tag identifying the run, made from the sorted run arguments
+        and ending with a hash of them. Equal runs have the same tag, unequal runs
+        have different tags, and it is safe to use in a file name. Long tags are 
+        truncated before the hash. Cached, it is reset when an argument is set as 
+        an attribute.
+
+        Returns:
+            str: The tag of the run, e.g. 'a=1_b=2_<hash>'.
+        """
+        if self._tag is None:
+            items = sorted(self._args.items(), key=lambda item: item[0])
+            # Making the arguments safe for a file name, or truncating them, can make unequal
+            # runs read the same, the hash of the original values tells them apart.
+            digest = hashlib.blake2b(repr(items).encode(), digest_size=6).hexdigest()
+            tag = '_'.join(f'{k}={v}' for k, v in items)
+            tag = _UNSAFE_FILENAME_RE.sub('-', tag)[:_MAX_TAG_LENGTH - len(digest) - 1]
+            self._tag = f'{tag}_{digest}'
+        return self._tag
+
+    def _empty_copy(self) -> 'Run':
+        """
+        Create a new object of the same class for a copy, without any arguments 
+        and with the cached hash and tag cleared.
+
+        Returns:
+            Run: The new object, its arguments are set by the caller.
+        """
+
+        new = type(self).__new__(type(self))
+        new._hash = None
+        new._tag = None
+        new._staged = False
+        return new
 
 
 class TaskQueue:
@@ -106,8 +325,9 @@ class TaskQueue:
 
     def __init__(self, max_tasks: int) -> None:
         self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
         self._max_tasks = max_tasks
-        self._running_tasks: list = []
+        self._running_tasks: set = set()
         self._tasks: list = []
 
     @abc.abstractmethod
@@ -151,8 +371,8 @@ class TaskQueue:
 
         return len(self._running_tasks) >= self._max_tasks
 
-    abc.abstractmethod
-    def wait(self, sleep=0.1) -> None:
+    @abc.abstractmethod
+    def wait(self, sleep=None) -> None:
         """
         Wait until there is a free position in the task queue, allowing another task to be added.
         Wait will block while the maximum number of tasks are running.
@@ -162,7 +382,7 @@ class TaskQueue:
         """
         pass
     
-    abc.abstractmethod
+    @abc.abstractmethod
     def wait_all(self, sleep=0.1) -> None:
         """
         Wait for all tasks to finish.
@@ -182,10 +402,14 @@ class ThreadQueue(TaskQueue):
         stop_event (threading.Event): The event to interupt the threads.
     """
 
+    # The maximum number of seconds to wait for interrupted threads to exit.
+    interupt_timeout = 10
+
     def __init__(self, max_threads: int, stop_event) -> None:
         super().__init__(max_threads)
         self._tasks: list[threading.Thread] = []
-        self._running_tasks: list[threading.Thread] = []
+        self._running_tasks: set[threading.Thread] = set()
+        self._errors: list[Exception] = []
         self._index = 0
         self._stop_event = stop_event
 
@@ -201,6 +425,7 @@ class ThreadQueue(TaskQueue):
                 raise StopIteration
             except KeyboardInterrupt as e:
                 self.interupt()
+                self.join_running(self.interupt_timeout)
                 raise StopIteration
             except Exception as e:
                 raise e
@@ -210,6 +435,7 @@ class ThreadQueue(TaskQueue):
             self.wait()
         except KeyboardInterrupt as e:
             self.interupt()
+            self.join_running(self.interupt_timeout)
             raise StopIteration
         
         result = self._tasks[self._index]
@@ -221,17 +447,33 @@ class ThreadQueue(TaskQueue):
         Start a task that is managed by the thread queue.
         """
 
-        self._lock.acquire()
-        task.start()
-        self._running_tasks.append(task)
-        self._lock.release()
+        # Register the task before starting it so it cannot finish before it is tracked,
+        # the thread is started outside the lock so waiters are not held up.
+        self._track(task)
+        with self._lock:
+            self._running_tasks.add(task)
+        
+        try:
+            task.start()
+        except BaseException:
+            with self._cond:
+                self._running_tasks.discard(task)
+                self._cond.notify_all()
+            raise
 
-    def wait(self, sleep=0.1) -> None:
+    def wait(self, sleep=None) -> None:
         """
         Wait until there is a free position in the thread queue, allowing 
         another threads to be added. Wait will block while the maximum number 
         of threads are running.
 
+        Threads signal the queue as they finish, and a stop is signalled 
+        through wake(), so no polling is required. 
+
+        Args:
+            sleep (float): The maximum time between checks of the stop event,
+            only needed if the stop event is set without calling wake().
+
         Returns:
             None
 
@@ -239,47 +481,117 @@ class ThreadQueue(TaskQueue):
             KeyboardInterrupt: If a keyboard interrupt is raised.
         """
 
-        self._lock.acquire()
-        while self.full():
-            if self._stop_event.is_set():
-                self._lock.release()
-                raise KeyboardInterrupt
-            
-            for t in self._running_tasks:
-                if not t.is_alive():
-                    self._running_tasks.remove(t)
-                    break
-            time.sleep(sleep)
+        def ready():
+            return not self.full() or self._stop_event.is_set()
 
-        self._lock.release()
+        with self._cond:
+            # Without a timeout this returns only once ready, with one it rechecks after each timeout.
+            while not self._cond.wait_for(ready, sleep):
+                pass
+            
+            # Still full, so the wait ended because of the stop event.
+            if self.full():
+                raise KeyboardInterrupt
 
-    def wait_all(self) -> None:
+    def wait_all(self, sleep=None) -> None:
         """
-        Wait for all threads to finish.
+        Wait for all threads to finish. Errors raised by the threads are 
+        collected as they finish, the first one to occur is raised once all 
+        threads are done. A stop signalled through wake() ends the wait early.
+
+        Args:
+            sleep (float): The maximum time between checks of the stop event,
+            only needed if the stop event is set without calling wake().
 
         Returns:
             None
 
         Raises:
             KeyboardInterrupt: If a keyboard interrupt is raised.
+            Exception: The first error raised by a thread.
         """
+
+        def done():
+            return not self._running_tasks or self._stop_event.is_set()
         
-        for t in self._running_tasks:
-            t.join()
+        with self._cond:
+            while not self._cond.wait_for(done, sleep):
+                pass
+
+            # Threads are still running, so the wait ended because of the stop event.
+            if self._running_tasks:
+                raise KeyboardInterrupt
+
+        if self._errors:
+            raise self._errors[0]
 
     def interupt(self) -> None:
         """
-        Interupts all running threads by sending a CTRL-C event.
+        Interupts the processes of all running threads, threads which have not 
+        started their process yet do not start it.
 
         Returns:
             None
         """
 
-        self._lock.acquire()
-        for task in self._running_tasks:
-            if task.is_alive():
-                os.kill(task._process.pid, signal.CTRL_C_EVENT)
-        self._lock.release()
+        with self._lock:
+            for task in self._running_tasks:
+                interupt = getattr(task, 'interupt', None)
+                if interupt is not None:
+                    interupt()
+
+    def join_running(self, timeout=None) -> None:
+        """
+        Wait for the running threads to exit, e.g. after they were interrupted,
+        without raising their errors.
+
+        Args:
+            timeout (float): The maximum time to wait in total, None to wait until they exit.
+
+        Returns:
+            None
+        """
+
+        with self._cond:
+            self._cond.wait_for(lambda: not self._running_tasks, timeout)
+
+    def wake(self) -> None:
+        """
+        Wake any threads waiting on the queue so they check the stop event.
+
+        Returns:
+            None
+        """
+
+        with self._cond:
+            self._cond.notify_all()
+
+    def _track(self, task: threading.Thread) -> None:
+        """
+        Wrap the run method of the thread so the queue is notified when it finishes.
+        """
+
+        run = task.run
+
+        def tracked_run():
+            try:
+                run()
+            finally:
+                self._release(task)
+
+        task.run = tracked_run
+
+    def _release(self, task: threading.Thread) -> None:
+        """
+        Remove a finished thread from the running tasks, record its error and wake any waiters.
+        """
+
+        with self._cond:
+            self._running_tasks.discard(task)
+            exc = getattr(task, 'exc', None)
+            if exc is not None:
+                self._errors.append(exc)
+            self._cond.notify_all()
 
 
 class Reporter:
@@ -311,7 +623,7 @@ class Reporter:
         """
         self.close()
 
-    abc.abstractmethod
+    @abc.abstractmethod
     def open(self) -> None:
         """
         Open the file with the specified mode.
@@ -324,7 +636,7 @@ class Reporter:
         """
         pass
     
-    abc.abstractmethod
+    @abc.abstractmethod
     def close(self) -> None:
         """
         Close the file.
@@ -334,33 +646,63 @@ class Reporter:
         """
         pass
     
-    abc.abstractmethod
-    def write(self, content: str) -> None:
+    @abc.abstractmethod
+    def write(self, content: bytes) -> None:
         """
         Write content to the file.
 
         Args:
-            content (str): The content to write.
+            content (bytes): The content to write.
 
         Returns:
             None
         """
         pass
 
+    def sink_from(self, chunks: Iterator[bytes]) -> None:
+        """
+        Write all content from an iterable of chunks.
+
+        Args:
+            chunks (Iterator[bytes]): The content to write, consumed until exhausted.
+
+        Returns:
+            None
+        """
+        for content in chunks:
+            self.write(content)
+
+    def fileno(self) -> int:
+        """
+        The file descriptor the output can be written to directly.
+
+        Returns:
+            int: The file descriptor, -1 if the output must be passed through write.
+        """
+        return -1
+
+    def location(self) -> str | None:
+        """
+        Where the output is reported to.
+
+        Returns:
+            str | None: The location of the output, None if it is not persisted.
+        """
+        return None
+
 
 class FileReporter(Reporter):
     """
     A class to report the output of a model run to a file.
 
     Parameters:
-        parameters (Parameters): The parameters of the model.
+        directory (str): The existing directory to write the file to.
         run (Run): The run to report to.
         run_number (str): The file to report to.
     """
 
-    def __init__(self, parameters: Parameters, run: Run, run_number: str) -> None:
-        self._parameters = parameters
-        self._file = self.__writeable(run, run_number)
+    def __init__(self, directory: str, run: Run, run_number: str) -> None:
+        self._file = self.__writeable(directory, run, run_number)
         self._f = None
 
     def open(self) -> None:
@@ -373,7 +715,7 @@ class FileReporter(Reporter):
         Returns:
             None
         """
-        self._f = open(self._file, 'w')
+        self._f = open(self._file, 'wb', buffering=1 << 20)
 
     def close(self) -> None:
         """
@@ -384,36 +726,59 @@ class FileReporter(Reporter):
         """
         self._f.close()
 
-    def write(self, content: str) -> None:
+    def write(self, content: bytes) -> None:
         """
         Write content to the file.
 
         Args:
-            content (str): The content to write.
+            content (bytes): The content to write.
 
         Returns:
             None
         """
         self._f.write(content)
 
-    def __writeable(self, run: Run, rn: str) -> str:
+    def sink_from(self, chunks: Iterator[bytes]) -> None:
+        """
+        Write all content from an iterable of chunks.
+
+        Args:
+            chunks (Iterator[bytes]): The content to write, consumed until exhausted.
+
+        Returns:
+            None
+        """
+        self._f.writelines(chunks)
+
+    def fileno(self) -> int:
+        """
+        The file descriptor of the open file, the process writes to it directly.
+
+        Returns:
+            int: The file descriptor.
+        """
+        return self._f.fileno()
+
+    def location(self) -> str:
+        """
+        Where the output is reported to.
+
+        Returns:
+            str: The path of the output file.
+        """
+        return self._file
+
+    def __writeable(self, path: str, run: Run, rn: str) -> str:
         """
         Returns the writable object to use for the reporter.
 
         For a FileReporter, this is the file name.
         """
 
-        try:
-            path = self._parameters.get_params()['stdout']
-            if not os.path.exists(path):
-                raise FileNotFoundError(f'{path} does not exist')
-        except KeyError:
-            path = os.getcwd()
-
         if rn is None:
             rn = 'NA'
 
-        return os.path.join(path, f'run_{rn}_{list(run.get_args().values())}.out')
+        return os.path.join(path, f'run_{rn}_{run.get_tag()}.out')
 
 
 class ModelProcess(threading.Thread):
@@ -423,52 +788,190 @@ class ModelProcess(threading.Thread):
     Parameters:
         command (list[str]): The command to run.
         reporter (Reporter): The Reporter to report outputs with.
+        label (str): The label of the run, used to identify the run in errors.
     """
 
-    def __init__(self, command: list[str], reporter: Reporter) -> None:
+    # The number of trailing output lines to include when the process fails.
+    tail_lines = 20
+    # The maximum number of bytes read from the process output at once.
+    chunk_size = 1 << 16
+    # The size requested for the output pipe, where supported, so the process is not blocked on a full pipe.
+    pipe_size = 1 << 20
+
+    def __init__(self, command: list[str], reporter: Reporter, label: str = None) -> None:
         super().__init__()
         self._command = command
         self._reporter = reporter
+        self._label = label
         self._process = None
+        # Guards starting the process against an interrupt arriving at the same time.
+        self._process_lock = threading.Lock()
+        self._interupted = False
         self.exc = None
 
+    def interupt(self) -> None:
+        """
+        Interupts the process. On Windows a CTRL-BREAK event is sent to its 
+        process group, elsewhere it is sent SIGINT. If the process has not 
+        started yet it is never started.
+
+        Returns:
+            None
+        """
+
+        sig = signal.CTRL_BREAK_EVENT if os.name == 'nt' else signal.SIGINT
+        with self._process_lock:
+            self._interupted = True
+            process = self._process
+            # The process may have already exited.
+            if process is not None and process.poll() is None:
+                process.send_signal(sig)
+
     def execute(self, cmd):
         """
-        Executes the subprocess and yields the stdout line by line.
+        Executes the subprocess and yields the raw stdout in chunks as it becomes 
+        available. The stderr is merged into the stdout.
 
         Args:
             cmd (list[str]): The command to run.
         Yields:
-            str: The stdout line.
+            bytes: The stdout chunk.
+        Raises:
+            RunnerError: If the process exits with an error, includes the last lines of output.
         """
 
-        try:
-            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True)
-        except FileNotFoundError as e:
-            raise FileNotFoundError(f'executable "{cmd[0]}" cannot be found') from e
-        except Exception as e:
-            raise e
+        if self._popen(cmd, subprocess.PIPE) is None:
+            return
         
-        for stdout_line in iter(self._process.stdout.readline, ""):
-            yield stdout_line 
+        # Only the end of the output is kept for error reporting.
+        tail = collections.deque(maxlen=2)
+        read = self._process.stdout.read1
+        while chunk := read(self.chunk_size):
+            tail.append(chunk)
+            yield chunk
         
         self._process.stdout.close()
+        self._check(self._process.wait(), b"".join(tail))
+
+    def execute_to(self, cmd, fileno: int) -> None:
+        """
+        Executes the subprocess with its stdout written straight to a file descriptor.
+        The stderr is merged into the stdout.
+
+        Args:
+            cmd (list[str]): The command to run.
+            fileno (int): The file descriptor to write the output to.
+        Raises:
+            RunnerError: If the process exits with an error, includes the last lines of output.
+        """
+
+        if self._popen(cmd, fileno) is None:
+            return
         return_code = self._process.wait()
+        if return_code:
+            self._check(return_code, self._read_tail())
+
+    def _popen(self, cmd, stdout) -> subprocess.Popen | None:
+        """
+        Start the subprocess, unless the thread has been interupted.
+
+        Args:
+            cmd (list[str]): The command to run.
+            stdout (int): Where to send the stdout, subprocess.PIPE or a file descriptor.
+        Returns:
+            subprocess.Popen: The started process, None if the thread was interupted first.
+        """
+
+        # On Windows each process gets its own process group so it can be sent a CTRL_BREAK_EVENT alone.
+        creationflags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
+        pipesize = self.pipe_size if stdout == subprocess.PIPE else -1
+
+        def popen(pipesize):
+            return subprocess.Popen(
+                cmd, 
+                stdout=stdout, 
+                stderr=subprocess.STDOUT, 
+                bufsize=self.chunk_size,
+                pipesize=pipesize,
+                creationflags=creationflags
+            )
+
+        # Held while starting, so an interrupt either stops the process starting or sees it.
+        with self._process_lock:
+            if self._interupted:
+                return None
+            try:
+                try:
+                    self._process = popen(pipesize)
+                except PermissionError:
+                    if pipesize < 0:
+                        raise
+                    # The pipe size is over the system or per user limit, use the default size.
+                    self._process = popen(-1)
+            except FileNotFoundError as e:
+                raise FileNotFoundError(f'executable "{cmd[0]}" cannot be found') from e
+            except Exception as e:
+                raise e
+            return self._process
+
+    def _check(self, return_code: int, tail: bytes) -> None:
+        """
+        Raise if the process exited with an error.
+
+        Args:
+            return_code (int): The return code of the process.
+            tail (bytes): The end of the process output.
+        Raises:
+            RunnerError: If the process exits with an error, includes the last lines of output.
+        """
         
         if return_code:
             # If the process was killed by a signal, ignore.
-            if return_code != 2:
-                raise RunnerError(f'Process exited with an error, check output. Return code: {return_code}')
+            if return_code not in _INTERRUPTED_RETURN_CODES:
+                location = self._reporter.location()
+                see = f', see {location}' if location is not None else ''
+                name = f' {self._label}' if self._label is not None else ''
+                # Output is only decoded when it is needed for the error message.
+                output = tail.decode(locale.getpreferredencoding(False), errors='replace')
+                lines = output.splitlines(keepends=True)[-self.tail_lines:]
+                raise RunnerError(
+                    f'Process{name} exited with an error, check output{see}. Return code: {return_code}\n'
+                    f'{"".join(lines)}'
+                )
+
+    def _read_tail(self) -> bytes:
+        """
+        Read the end of the output the process wrote to the reporter's file.
+
+        Returns:
+            bytes: Up to the last chunk_size bytes of the output, empty if it cannot be read.
+        """
+
+        location = self._reporter.location()
+        if location is None:
+            return b""
+        try:
+            with open(location, 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - self.chunk_size))
+                return f.read()
+        except OSError:
+            return b""
         
     def run(self) -> None:
         """
-        Main thread method to run the model process.
+        Main thread method to run the model process. If the reporter is backed 
+        by a file, the process writes to it directly, otherwise the output is 
+        passed through the reporter.
         """
 
         try:
             with self._reporter as f:
-                for out in self.execute(self._command):
-                    f.write(out)
+                fileno = f.fileno()
+                if fileno < 0:
+                    f.sink_from(self.execute(self._command))
+                else:
+                    self.execute_to(self._command, fileno)
         except Exception as e:
             self.exc = e
 
@@ -485,8 +988,9 @@ class ModelProcess(threading.Thread):
 
         while self.is_alive():
             super().join(1)
-            if self.exc is not None:
-                raise self.exc
+
+        if self.exc is not None:
+            raise self.exc
         
 
 class Spawner:
@@ -496,6 +1000,7 @@ class Spawner:
 
     def __init__(self) -> None:
         self.exc = None
+        self.queue: ThreadQueue | None = None
         
     def run(self, labels, simulations, stop_event, async_runs) -> None:
         """
@@ -504,6 +1009,7 @@ class Spawner:
 
         label_itr = iter(labels)
         thread_queue = ThreadQueue(async_runs, stop_event)
+        self.queue = thread_queue
         for sim in simulations:
             thread_queue.add(sim)
         
@@ -531,28 +1037,35 @@ class Runner:
         self._stop_event = threading.Event()
         self._parameters: Parameters = parameters
         self._runs: list[Run] = []
-        self._index: int = 0
+        self._run_set: set[Run] = set()
+        self._staged_changes = _staged_run_changes
+        self._by_value: dict | None = None
+        self._commands: dict[tuple, list[str]] = {}
+        self._commands_key: tuple | None = None
+        self._req_args: frozenset[str] = frozenset()
+        self._req_args_key: tuple | None = None
         self._reporter = FileReporter
+        self._spawner: Spawner | None = None
 
-        # Set the signal handler.
-        signal.signal(signal.SIGINT, self._signal_handler)
+        # Stop this runner along with any others on a keyboard interrupt.
+        _register_runner(self)
 
         # Stage all the runs from the provided runners.
         for runner in args:
             if isinstance(runner, Runner):
                 for run in runner:
-                    self._runs.append(run)
+                    if run not in self._run_set:
+                        self._run_set.add(run)
+                        self._runs.append(run)
 
-    def __iter__(self) -> 'Runner':
-        self._index = 0
-        return self
+    def __iter__(self) -> Iterator[Run]:
+        return iter(self._runs)
 
-    def __next__(self) -> Run:
-        if self._index < len(self._runs):
-            result = self._runs[self._index]
-            self._index += 1
-            return result
-        raise StopIteration
+    def __contains__(self, run: object) -> bool:
+        if not isinstance(run, Run):
+            return False
+        self._sync_staged()
+        return run in self._run_set
     
     def __len__(self) -> int:
         return len(self._runs)
@@ -573,6 +1086,7 @@ class Runner:
             self._stop_event.clear()
         
         spawner = Spawner()
+        self._spawner = spawner
         thread = threading.Thread(target=spawner.run, args=(*self.arguments(*run_numbers),))
         thread.start()
 
@@ -592,17 +1106,14 @@ class Runner:
         Returns all the parameters required to run the models.
         """
 
-        # Get flags from parameters, or use default
-        try:
-            flags = self._parameters.get_params()['flags']
-        except KeyError:
-            flags = None
+        # Get the flags, number of async runs and run order from parameters, or use defaults
+        params = self._parameters.get_params()
+        flags = params.get('flags')
+        async_runs = params.get('async_runs', 1)
+        warm_start = params.get('warm_start', True)
 
-        # Get the number of async runs from parameters, or use default
-        try:
-            async_runs = self._parameters.get_params()['async_runs']
-        except KeyError:
-            async_runs = 1
+        # The output directory is the same for every run, only check it once.
+        stdout = self._stdout_dir()
 
         # Deal with the run numbers.
         if len(run_numbers) == 0:
@@ -612,19 +1123,73 @@ class Runner:
             if rn is not None and not isinstance(rn, str):
                 raise RunnerError('run number must be a string')
 
+        # Run the same run number back to back so its inputs are still cached by the OS.
+        if warm_start:
+            pairs = [(run, rn) for rn in run_numbers for run in self]
+        else:
+            pairs = [(run, rn) for run in self for rn in run_numbers]
+
         # Get all the model processes and their labels which are to be run.
         simulations = []
         labels = []
-        for run in self:
-            for rn in run_numbers:
-                command = self._build_command(self._parameters, run, flags, rn)
-                reporter = self._reporter(self._parameters, run, rn)
-                model_proc = ModelProcess(command, reporter)
-                labels.append(f'{run}_{rn}')
-                simulations.append(model_proc)
+        command = self._command
+        reporter = self._reporter
+        for run, rn in pairs:
+            label = f'{run}_{rn}'
+            labels.append(label)
+            simulations.append(ModelProcess(command(run, flags, rn), reporter(stdout, run, rn), label))
 
         return labels, simulations, self._stop_event, async_runs
 
+    def _stdout_dir(self) -> str:
+        """
+        Returns the directory the run outputs are written to, the current 
+        working directory if it is not set in the parameters.
+
+        Raises:
+            FileNotFoundError: If the directory set in the parameters does not exist.
+
+        Returns:
+            str: The output directory.
+        """
+
+        path = self._parameters.get_params().get('stdout')
+        if path is None:
+            return os.getcwd()
+        
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'{path} does not exist')
+        return path
+
+    def _command(self, run: Run, flags: list[str], run_number: str) -> list[str]:
+        """
+        Returns the command for a run, built once and then cached. The cache 
+        is cleared when the parameters, the files they refer to or the command 
+        builder change.
+
+        Args:
+            run (Run): The run to build the command for.
+            flags (list[str]): The flags to pass to the model.
+            run_number (str): The run number.
+
+        Returns:
+            list[str]: The command.
+        """
+
+        build = self._build_command
+        # The parameters count how many times they have been set, and how often the files they refer to changed.
+        cache_key = (self._parameters, self._parameters._cache_key(), getattr(build, '__func__', build))
+        if cache_key != self._commands_key:
+            self._commands = {}
+            self._commands_key = cache_key
+
+        key = (run, run_number, tuple(flags) if flags else None)
+        command = self._commands.get(key)
+        if command is None:
+            command = build(self._parameters, run, flags, run_number)
+            self._commands[key] = command
+        return command
+
     def stage(self, run: Run | list[Run]) -> None:
         """
         Adds a run/s to the list of runs for this model runner.
@@ -646,15 +1211,21 @@ class Runner:
         if not isinstance(run, list):
             raise RunnerError('run must be an instance of Run class or a list of Run objects')
         
+        if not run:
+            return
+
+        # The required arguments are the same for the whole batch.
+        req_args = self._required_args()
         for r in run:
-            self._stage_one(r)
+            self._stage_one(r, req_args)
 
-    def _stage_one(self, run: Run) -> None:
+    def _stage_one(self, run: Run, req_args: frozenset[str] = None) -> None:
         """
         Adds a run to the list of runs for this model runner.
 
         Args:
             run (Run): The run to be added.
+            req_args (frozenset[str]): The required arguments, fetched from the parameters if not provided.
 
         Raises:
             RunnerError: If the provided run is not an instance of the Run class.
@@ -667,16 +1238,50 @@ class Runner:
         if not isinstance(run, Run):
             raise RunnerError('run must be an instance of Run class')
         
-        run_args: set = set(run.get_args().keys())
-        req_args: set = set(self._parameters.get_run_args())
-        
-        if run_args != req_args:
+        if req_args is None:
+            req_args = self._required_args()
+
+        # The keys view compares with a set directly, without copying the keys.
+        if run.get_args().keys() != req_args:
             raise RunnerError(
-                f'run arguments: {run_args}, do not match required arguments: {req_args}'
+                f'run arguments: {set(run.get_args())}, do not match required arguments: {set(req_args)}'
             )
 
-        if run not in self._runs:
+        self._sync_staged()
+        if run not in self._run_set:
+            # Index the run first so a failure does not leave it half staged.
+            if self._by_value is not None:
+                self._index(run)
+            self._run_set.add(run)
             self._runs.append(run)
+            run._staged = True
+
+    def _sync_staged(self) -> None:
+        """
+        Rebuilds the set and the index of the staged runs if an argument of a 
+        staged run was set since they were built, the run is found by its hash.
+        """
+
+        if self._staged_changes != _staged_run_changes:
+            self._run_set = set(self._runs)
+            self._by_value = None
+            self._staged_changes = _staged_run_changes
+
+    def _required_args(self) -> frozenset[str]:
+        """
+        Returns the arguments a run requires, fetched from the parameters once 
+        and then cached until the parameters change.
+
+        Returns:
+            frozenset[str]: The required arguments.
+        """
+
+        parameters = self._parameters
+        if self._req_args_key != (parameters, parameters._version):
+            self._req_args = frozenset(parameters.get_run_args())
+            # Fetching the arguments may set them on the parameters, key on the version after.
+            self._req_args_key = (parameters, parameters._version)
+        return self._req_args
 
     def get_runs(self, *args: str, any=True):
         """
@@ -694,17 +1299,85 @@ class Runner:
         if len(args) == 0:
             return self._runs
         
-        ret: list[Run] = []
-        args: set = set(args)
-        for run in self:
-            run_args = set(run.get_args().values())
-            if any:
-                if args.intersection(run_args):
-                    ret.append(run)
-            else:
-                if args.intersection(run_args) == args:
-                    ret.append(run)
-        return ret
+        return list(self.iter_runs(*args, any=any))
+
+    def iter_runs(self, *args: str, any=True) -> Iterator[Run]:
+        """
+        Lazily yields the runs that match the provided arguments, in the order they were staged.
+
+        Args:
+            *args (str): Variable number of arguments to filter the runs.
+            any (bool): If True, yields runs that have any of the provided arguments.
+                        If False, yields runs that have all of the provided arguments.
+
+        Yields:
+            Run: The runs that match the provided arguments.
+        """
+
+        if len(args) == 0:
+            yield from self._runs
+            return
+
+        index = self._value_index()
+        buckets = [index.get(arg, set()) for arg in set(args)]
+        if any:
+            matches = set().union(*buckets)
+        else:
+            matches = set.intersection(*buckets)
+        
+        # Keep the order the runs were staged in.
+        for run in self._runs:
+            if run in matches:
+                yield run
+
+    def _value_index(self) -> dict:
+        """
+        Returns the index of argument values to the runs which have that value.
+        The index is built on first use and then kept up to date as runs are staged or removed.
+
+        Returns:
+            dict: A dictionary of argument value to a set of runs.
+        """
+
+        self._sync_staged()
+        if self._by_value is None:
+            self._by_value = {}
+            for run in self._runs:
+                self._index(run)
+        return self._by_value
+
+    def _index(self, run: Run) -> None:
+        """
+        Adds a run to the index of argument values. Unhashable values are not 
+        indexed, they can never equal the hashable arguments searched for.
+
+        Args:
+            run (Run): The run to add.
+        """
+
+        for value in run.get_args().values():
+            try:
+                self._by_value.setdefault(value, set()).add(run)
+            except TypeError:
+                pass
+
+    def _unindex(self, run: Run) -> None:
+        """
+        Removes a run from the index of argument values.
+
+        Args:
+            run (Run): The run to remove.
+        """
+
+        for value in run.get_args().values():
+            try:
+                bucket = self._by_value.get(value)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.discard(run)
+                if not bucket:
+                    del self._by_value[value]
     
     def remove_runs(self, runs: Run | list[Run]) -> None:
         """
@@ -726,8 +1399,12 @@ class Runner:
         for run in runs:
             if not isinstance(run, Run):
                 raise RunnerError(f'{run} - is not an instances of Run class')
-            if run in self._runs:
+            self._sync_staged()
+            if run in self._run_set:
+                self._run_set.discard(run)
                 self._runs.remove(run)
+                if self._by_value is not None:
+                    self._unindex(run)
         
     def stop(self) -> None:
         """
@@ -739,6 +1416,11 @@ class Runner:
 
         self._stop_event.set()
 
+        # Wake the spawner if it is waiting on a free position in the queue.
+        spawner = self._spawner
+        if spawner is not None and spawner.queue is not None:
+            spawner.queue.wake()
+
     def pause(self) -> None:
         """
         Pauses all running models.
@@ -772,9 +1454,18 @@ class Runner:
 
         self.stop()
 
-    abc.abstractmethod
-    def _build_command(self, parameters: Parameters, run: Run, *flags: list[str]) -> list[str]:
+    @abc.abstractmethod
+    def _build_command(self, parameters: Parameters, run: Run, flags: list[str], run_number: str) -> list[str]:
         """
         Build the command string to pass to subprocess.run(), this will be model dependent.
+
+        Args:
+            parameters (Parameters): The parameters of the model.
+            run (Run): The run to build the command for.
+            flags (list[str]): The flags to pass to the model, None if not set.
+            run_number (str): The run number, None if not provided.
+
+        Returns:
+            list[str]: The command.
         """
         pass
\ No newline at end of file
@@ -1,8 +1,16 @@
 from ..core import runnerbase
 import os
 import re
+import collections
+
+# Directories TUFLOW writes its outputs to, they never hold the tcf files and can be large.
+_OUTPUT_DIR_PREFIXES = ("results", "check", "log")
+# The argument tokens of a tcf file name sit between pairs of ~, e.g. model_~s1~_~e1~.tcf.
+_ARGUMENT_TOKEN_RE = re.compile(r"~([^~]+)~")
 
 class Parameters(runnerbase.Parameters):
+    __slots__ = ('_tcfs', '_tcf_files', '_tcf_files_key', '_tcf_generation', '_exe', '_exe_key')
+
     def __init__(self, clone: 'Parameters' = None, **kwargs):       
         if 'flags' in kwargs:
             if not isinstance(kwargs['flags'], list):
@@ -20,6 +28,7 @@ class Parameters(runnerbase.Parameters):
             kwargs['run_args'] = None
         
         super().__init__(clone, **kwargs)
+        self._clear_caches()
         
         req_parameters = {"exec_path", "root", "version", "engine"}
         if not self._check_required(req_parameters):
@@ -45,39 +54,137 @@ class Parameters(runnerbase.Parameters):
 
         return self.run_args
 
+    def _clear_caches(self) -> None:
+        """
+        Clear the values derived from the parameters and the files under the root.
+        """
+
+        # The tcf files found under the root and the tcf file for each run number, 
+        # cleared when the root or group change.
+        self._tcfs: dict[str, str] = {}
+        self._tcf_files: list[str] | None = None
+        self._tcf_files_key: tuple | None = None
+        # Incremented whenever the tcf cache is invalidated, so commands built from it are rebuilt.
+        self._tcf_generation = 0
+        # The path to the executable, cleared when the parameters or the working directory change.
+        self._exe: str | None = None
+        self._exe_key: tuple | None = None
+
+    def _empty_copy(self) -> 'Parameters':
+        new = super()._empty_copy()
+        new._clear_caches()
+        return new
+
+    def invalidate_tcf_cache(self) -> None:
+        """
+        Forget the tcf files found so far, use when the files under the root have changed.
+        """
+
+        self._tcf_files = None
+        self._tcfs = {}
+        self._tcf_generation += 1
+
+    def _cache_key(self) -> tuple:
+        """
+        Returns a key which changes whenever values derived from the parameters may
+        have changed. The tcf files can change without the parameters changing, and
+        relative paths are resolved against the working directory.
+
+        Returns:
+            tuple: The key.
+        """
+
+        return (self._version, self._tcf_generation, os.getcwd())
+
     def _find_tcfs(self) -> list[str] | None:
         """
-        Find all the tcf files in the root directory.
+        Find all the tcf files in the root directory. The search is cached until
+        the root or group change or invalidate_tcf_cache is called.
 
         Returns:
             list[str]: A list of all the tcf files found. None if no tcf files found.
         """
 
-        # Get the group name if it exists
-        if 'group' not in self.get_params():
-            group = ""
-        else:
-            group = self.get_params()['group']
+        # Only the root and group decide which files are found, other parameters change often.
+        # A relative root is searched again if the working directory changes, the root is
+        # only resolved when it is searched.
+        group = self.get_params().get('group', "")
+        key = (self.root, os.getcwd(), group)
+        if self._tcf_files is None or self._tcf_files_key != key:
+            self._tcf_files = self._search_tcfs(os.path.realpath(self.root), group)
+            self._tcf_files_key = key
+            self._tcfs = {}
 
-        root_path = os.path.realpath(self.root)
+        return self._tcf_files or None
 
-        tcf_files = []
-        for root, _, files in os.walk(root_path):
-            for file in files:
-                if file.startswith(group) and file.endswith(".tcf"):
-                    tcf_files.append(os.path.join(root, file))
+    def _search_tcfs(self, root_path: str, group: str) -> list[str]:
+        """
+        Search the root directory for the tcf files.
+
+        Args:
+            root_path (str): The resolved path of the root directory.
+            group (str): The prefix of the tcf files, empty for any.
+
+        Returns:
+            list[str]: A sorted list of all the tcf files found.
+        """
+
+        # The tcf files normally sit in the root, only search deeper if there are none.
+        tcf_files, dirs = self._scan_dir(root_path, group)
+        if not tcf_files:
+            dirs = collections.deque(dirs)
+            while dirs:
+                found, sub_dirs = self._scan_dir(dirs.popleft(), group)
+                tcf_files.extend(found)
+                dirs.extend(sub_dirs)
         
-        if len(tcf_files) > 0:
-            return tcf_files
-        else:
-            return None
+        return sorted(tcf_files)
+
+    def _scan_dir(self, path: str, group: str) -> tuple[list[str], list[str]]:
+        """
+        Scan a single directory for tcf files.
+
+        Returns:
+            tuple[list[str], list[str]]: The tcf files found and the sub directories to search.
+        """
+
+        tcf_files = []
+        dirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Hidden and output directories are not searched.
+                        name = entry.name
+                        if not name.startswith(".") and not name.lower().startswith(_OUTPUT_DIR_PREFIXES):
+                            dirs.append(entry.path)
+                    elif entry.name.startswith(group) and entry.name.endswith(".tcf"):
+                        tcf_files.append(entry.path)
+        except OSError:
+            # Unreadable or missing directories are skipped, as os.walk does.
+            pass
+
+        return tcf_files, dirs
         
     
     def get_tcf(self, run_number: str) -> str:
         """
-        Return the tuflow control file.
+        Return the tuflow control file. The result is cached for each run number
+        until the root or group change.
         """
+
+        # Refresh the tcf files first, clears the cached run numbers if they changed.
         tcf_files = self._find_tcfs()
+
+        if run_number not in self._tcfs:
+            self._tcfs[run_number] = self._match_tcf(run_number, tcf_files)
+
+        return self._tcfs[run_number]
+
+    def _match_tcf(self, run_number: str, tcf_files: list[str] | None) -> str:
+        """
+        Find the tuflow control file for the run number among the tcf files found.
+        """
         
         if tcf_files is None:
             raise FileNotFoundError(f"No .tcf files found in {self.root}.")
@@ -89,8 +196,8 @@ class Parameters(runnerbase.Parameters):
             if run_number is None:
                 raise ValueError(f"Multiple .tcf files found in {self.root}. Must specify run number.")
 
-            pattern = f"_{run_number}\.tcf$"
-            matches = [tcf for tcf in tcf_files if re.search(pattern, tcf)]
+            suffix = f"_{run_number}.tcf"
+            matches = [tcf for tcf in tcf_files if tcf.endswith(suffix)]
 
             if len(matches) == 0:
                 raise FileNotFoundError(f"No .tcf files found in {self.root} with run number {run_number}.")
@@ -104,8 +211,14 @@ class Parameters(runnerbase.Parameters):
     
     def executable(self) -> str:
         """
-        Build the path to the correct executable.
+        Build the path to the correct executable. The result is cached until 
+        the parameters or the working directory change.
         """
+
+        # A relative exec_path is resolved against the working directory.
+        key = (self._version, os.getcwd())
+        if self._exe is not None and self._exe_key == key:
+            return self._exe
         
         engine = self.engine.upper()
         if engine not in {"SP", "DP"}:
@@ -115,35 +228,49 @@ class Parameters(runnerbase.Parameters):
 
         exec_path = os.path.realpath(self.exec_path)
 
-        return os.path.join(exec_path, self.version, engine)
+        self._exe = os.path.join(exec_path, self.version, engine)
+        self._exe_key = key
+        return self._exe
     
     def __get_argument_tokens(self, tcf_file: str) -> list[str]:
         """
         Parse the tcf_file to get the argument tokens.
         """
 
-        # Extract the argument tokens using regex
-        pattern = r"~([^~]+)~"
-        argument_tokens = re.findall(pattern, tcf_file)
+        argument_tokens = _ARGUMENT_TOKEN_RE.findall(tcf_file)
 
         return argument_tokens
 
 
 class Run(runnerbase.Run):
+    __slots__ = ('_run_args',)
+
     def __init__(self, clone: 'Run'=None, **kwargs) -> list[str]:
         super().__init__(clone, **kwargs)
+        # The formatted command line arguments, cleared when an argument is set.
+        self._run_args: tuple[str, ...] | None = None
+
+    def _empty_copy(self) -> 'Run':
+        new = super()._empty_copy()
+        new._run_args = None
+        return new
+
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith('_'):
+            self._run_args = None
 
     def run_args(self) -> list[str]:
         """
         Get the arguments.
         """
 
-        ret = []
-        for k, v in self.get_args().items():
-            ret.append(f"-{k}")
-            ret.append(f"{v}")
+        if self._run_args is None:
+            self._run_args = tuple(
+                arg for k, v in self.get_args().items() for arg in (f"-{k}", f"{v}")
+            )
 
-        return ret                                                   
+        return list(self._run_args)
 
 
 class Runner(runnerbase.Runner):
@@ -151,7 +278,4 @@ class Runner(runnerbase.Runner):
         """
         Build the command string to pass to subprocess.run(), this will be model dependent.
         """
-        if not flags:
-            flags = [""]
-
-        return [parameters.executable(), *flags, *run.run_args(), parameters.get_tcf(run_number)]
\ No newline at end of file
+        return [parameters.executable(), *(flags or ("",)), *run.run_args(), parameters.get_tcf(run_number)]
\ No newline at end of file
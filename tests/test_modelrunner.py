@@ -3,6 +3,8 @@ import sys
 import threading
 import time
 import os
+import copy
+import signal
 import simrunner.core.runnerbase as mr
 
 class TestTaskQueue(unittest.TestCase):
@@ -44,8 +46,8 @@ class TestThreadQueue(unittest.TestCase):
         thread2 = threading.Thread(target=time.sleep, args=(0.1,))
         self.queue.add(thread1)
         self.queue.add(thread2)
-        self.queue._running_tasks.append(thread1)
-        self.queue._running_tasks.append(thread2)
+        self.queue._running_tasks.add(thread1)
+        self.queue._running_tasks.add(thread2)
         self.assertTrue(self.queue.full())
 
     def test_wait(self):
@@ -56,6 +58,94 @@ class TestThreadQueue(unittest.TestCase):
         self.queue.wait()
         self.assertFalse(self.queue.full())
 
+    def test_wait_notified(self):
+        # Finishing threads should wake the queue, not the sleep interval
+        thread1 = threading.Thread(target=time.sleep, args=(0.1,))
+        thread2 = threading.Thread(target=time.sleep, args=(0.1,))
+        self.queue.start(thread1)
+        self.queue.start(thread2)
+        start = time.time()
+        self.queue.wait(sleep=10)
+        self.assertLess(time.time() - start, 5)
+        self.assertFalse(self.queue.full())
+
+    def test_wait_stopped(self):
+        # Waking the queue with the stop event set interrupts the wait
+        stop_event = threading.Event()
+        queue = mr.ThreadQueue(1, stop_event)
+        queue.start(threading.Thread(target=time.sleep, args=(1,)))
+        def stop():
+            time.sleep(0.1)
+            stop_event.set()
+            queue.wake()
+        threading.Thread(target=stop).start()
+        start = time.time()
+        try:
+            queue.wait()
+            self.fail('Expected KeyboardInterrupt')
+        except KeyboardInterrupt:
+            pass
+        self.assertLess(time.time() - start, 0.9)
+
+        # Waiting for all threads is interrupted the same way
+        stop_event.clear()
+        threading.Thread(target=stop).start()
+        start = time.time()
+        try:
+            queue.wait_all()
+            self.fail('Expected KeyboardInterrupt')
+        except KeyboardInterrupt:
+            pass
+        self.assertLess(time.time() - start, 0.9)
+
+    def test_interupt(self):
+        # Interrupting the queue stops the running processes
+        process = mr.ModelProcess(['python', './tests/stubs/process.py', '10'], mr.Reporter())
+        self.queue.start(process)
+        while process._process is None:
+            time.sleep(0.01)
+        start = time.time()
+        self.queue.interupt()
+        try:
+            process.join()
+        except mr.RunnerError:
+            # The stub does not handle the interrupt itself.
+            pass
+        self.assertLess(time.time() - start, 5)
+
+        # Threads without a process are skipped
+        self.queue.start(threading.Thread(target=time.sleep, args=(0.1,)))
+        self.queue.interupt()
+
+        # A thread interrupted before it starts its process never starts it
+        process = mr.ModelProcess(['python', './tests/stubs/process.py', '10'], mr.Reporter())
+        start = time.time()
+        self.queue.start(process)
+        self.queue.interupt()
+        try:
+            process.join()
+        except mr.RunnerError:
+            pass
+        self.assertLess(time.time() - start, 5)
+
+    def test_interupt_joins(self):
+        # Stopping the queue interrupts the running threads and waits for them to exit
+        stop_event = threading.Event()
+        queue = mr.ThreadQueue(1, stop_event)
+        process = mr.ModelProcess(['python', './tests/stubs/process.py', '1'], mr.Reporter())
+        queue.add(process)
+        threads = iter(queue)
+        queue.start(next(threads))
+        stop_event.set()
+        start = time.time()
+        try:
+            next(threads)
+            self.fail('Expected StopIteration')
+        except StopIteration:
+            pass
+        self.assertFalse(process.is_alive())
+        self.assertLess(time.time() - start, 5)
+
     def test_start(self):
         thread1 = threading.Thread(target=time.sleep, args=(0.1,))
         thread2 = threading.Thread(target=time.sleep, args=(0.1,))
@@ -84,6 +174,37 @@ class TestModelProcess(unittest.TestCase):
         process.join()
         self.assertFalse(process.is_alive())
 
+    def test_model_process_pipe_size(self):
+        # A pipe size over the system limit falls back to the default size
+        class LargePipeProcess(mr.ModelProcess):
+            pipe_size = 1 << 28
+        process = LargePipeProcess(['python', './tests/stubs/process.py', '0.1'], mr.Reporter())
+        process.start()
+        process.join()
+        self.assertEqual(process._process.returncode, 0)
+
+    def test_model_process_interupted(self):
+        # The process is not started once the thread has been interrupted
+        process = mr.ModelProcess(['python', './tests/stubs/process.py', '10'], mr.Reporter())
+        process.interupt()
+        process.start()
+        process.join()
+        self.assertIsNone(process._process)
+
+    def test_model_process_error(self):
+        # The error is raised even if the thread finished before join
+        process_args = ['python', '-c', 'import sys; sys.stderr.write("bad input"); sys.exit(3)']
+        process = mr.ModelProcess(process_args, mr.Reporter())
+        process.start()
+        while process.is_alive():
+            time.sleep(0.01)
+        try:
+            process.join()
+            self.fail('Expected RunnerError')
+        except mr.RunnerError as e:
+            # The tail of the output, including stderr, is in the error
+            self.assertIn('bad input', str(e))
+
 class TestThreadedProcess(unittest.TestCase):
     def test_threaded_process(self):
         process_args = ['python', './tests/stubs/process.py', '0.1']
@@ -99,6 +220,21 @@ class TestThreadedProcess(unittest.TestCase):
         thread_queue.wait_all()
         self.assertEqual(len(thread_queue._running_tasks), 0)
 
+    def test_error_collected(self):
+        # An error from a run which finished early is not lost
+        stop_event = threading.Event()
+        thread_queue = mr.ThreadQueue(2, stop_event)
+        p1 = mr.ModelProcess(['python', '-c', 'import sys; sys.exit(3)'], mr.Reporter())
+        p2 = mr.ModelProcess(['python', './tests/stubs/process.py', '0.1'], mr.Reporter())
+        thread_queue.start(p1)
+        thread_queue.start(p2)
+        try:
+            thread_queue.wait_all()
+            self.fail('Expected RunnerError')
+        except mr.RunnerError:
+            pass
+        self.assertFalse(p2.is_alive())
+
     def test_waiting_on_finish(self):
         process_args = ['python', './tests/stubs/process.py', '0.1']
         stop_event = threading.Event()  
@@ -129,6 +265,19 @@ class TestParameters(unittest.TestCase):
         self.assertEqual(p_extend.get_params(), {'a': 1, 'b': 2, 'c': 3})
         self.assertEqual(p_extend.get_run_args(), ['a', 'b', 'c'])
 
+        # Test setting a parameter on a clone or the original does not affect the other
+        p_extend.a = 4
+        self.assertEqual(p.a, 1)
+        p_original: mr.Parameters = Parameters(a=1, b=2, c=3)
+        p_extend = Parameters(p_original)
+        p_original.a = 5
+        self.assertEqual(p_extend.a, 1)
+
+        # Test changing a clone through get_params does not affect the original
+        p_extend = Parameters(p_original)
+        p_extend.get_params()['a'] = 9
+        self.assertEqual(p_original.a, 5)
+
         # Test extending
         p_extend: mr.Parameters = Parameters(p, d=4)
         try:
@@ -143,6 +292,26 @@ class TestParameters(unittest.TestCase):
         p_extend: mr.Parameters = Parameters(p, a=4)
         self.assertEqual(p_extend.get_params(), {'a': 4, 'b': 2, 'c': 3})
 
+    def test_parameters_copy(self):
+        class Parameters(mr.Parameters):
+            def get_run_args(self):
+                return ['a', 'b', 'c']
+
+        # Test a copy does not share parameters with the original
+        p: mr.Parameters = Parameters(a=1, b=[2], c=3)
+        p.a = 2
+        p_copy: mr.Parameters = copy.copy(p)
+        self.assertIsInstance(p_copy, Parameters)
+        self.assertEqual(p_copy.get_params(), p.get_params())
+        self.assertEqual(p_copy._version, 0)
+        p_copy.a = 99
+        self.assertEqual(p.a, 2)
+
+        # Test a deep copy does not share the parameter values either
+        p_copy = copy.deepcopy(p)
+        p_copy.b.append(3)
+        self.assertEqual(p.b, [2])
+
 class TestRun(unittest.TestCase):
     def setUp(self) -> None:
         return super().setUp()
@@ -164,6 +333,96 @@ class TestRun(unittest.TestCase):
         r_extend: mr.Run = mr.Run(r, a=4)
         self.assertEqual(r_extend.get_args(), {'a': 4, 'b': 2, 'c': 3})
 
+        # Test the clone does not share arguments with the original
+        r_extend.d = 5
+        self.assertEqual(r.get_args(), {'a': 1, 'b': 2, 'c': 3})
+        r_clone: mr.Run = mr.Run(r)
+        r_clone.a = 4
+        self.assertEqual(r.a, 1)
+        self.assertNotEqual(hash(r), hash(r_clone))
+        r_clone = mr.Run(r)
+        r.a = 5
+        self.assertEqual(r_clone.a, 1)
+
+        # Test changing the arguments of a clone through get_args does not affect the original
+        r_clone = mr.Run(r)
+        r_clone.get_args()['a'] = 9
+        self.assertEqual(r_clone.a, 9)
+        self.assertEqual(r.a, 5)
+
+    def test_run_attributes(self):
+        # Arguments are accessible as attributes and stored as arguments
+        r: mr.Run = mr.Run(a=1, b=2, c=3)
+        self.assertEqual(r.a, 1)
+        r.d = 4
+        self.assertEqual(r.get_args(), {'a': 1, 'b': 2, 'c': 3, 'd': 4})
+        self.assertEqual(vars(r), {'a': 1, 'b': 2, 'c': 3, 'd': 4})
+        try:
+            r.e
+            self.fail('Expected AttributeError')
+        except AttributeError:
+            pass
+
+    def test_run_copy(self):
+        # Test a copy does not share arguments with the original
+        r: mr.Run = mr.Run(a=1, b=[2])
+        r.get_tag()
+        r_copy: mr.Run = copy.copy(r)
+        self.assertEqual(r_copy, r)
+        self.assertIsNone(r_copy._hash)
+        self.assertIsNone(r_copy._tag)
+        r_copy.a = 99
+        self.assertEqual(r.a, 1)
+        self.assertNotEqual(r_copy.get_tag(), r.get_tag())
+
+        # Test a deep copy does not share the argument values either
+        r_copy = copy.deepcopy(r)
+        r_copy.b.append(3)
+        self.assertEqual(r.b, [2])
+
+    def test_run_hash(self):
+        # Equal runs hash the same
+        r1: mr.Run = mr.Run(a=1, b=2, c=3)
+        r2: mr.Run = mr.Run(c=3, b=2, a=1)
+        self.assertEqual(hash(r1), hash(r2))
+        self.assertEqual(len({r1, r2}), 1)
+
+        # Test unhashable argument values
+        r3: mr.Run = mr.Run(a=[1], b=2, c=3)
+        r4: mr.Run = mr.Run(a=[1], b=2, c=3)
+        self.assertEqual(hash(r3), hash(r4))
+        self.assertEqual(len({r1, r3, r4}), 2)
+
+        # Setting an argument resets the cached hash
+        r2.d = 4
+        self.assertNotEqual(hash(r1), hash(r2))
+        self.assertEqual(hash(r2), hash(mr.Run(a=1, b=2, c=3, d=4)))
+
+    def test_run_tag(self):
+        # Equal runs share a tag regardless of argument order
+        r1: mr.Run = mr.Run(b=2, a=1)
+        self.assertTrue(r1.get_tag().startswith('a=1_b=2_'))
+        self.assertEqual(r1.get_tag(), mr.Run(a=1, b=2).get_tag())
+
+        # Setting an argument resets the cached tag
+        r1.c = 3
+        self.assertTrue(r1.get_tag().startswith('a=1_b=2_c=3_'))
+
+        # Test unequal runs which format the same have different tags
+        self.assertNotEqual(mr.Run(a=1).get_tag(), mr.Run(a='1').get_tag())
+        self.assertNotEqual(mr.Run(a='1', b='2').get_tag(), mr.Run(a='1_b=2').get_tag())
+
+        # Test the tag is safe to use as a file name
+        r2: mr.Run = mr.Run(a='x/y', b='c:\\d e')
+        self.assertTrue(r2.get_tag().startswith('a=x-y_b=c--d-e_'))
+        r3: mr.Run = mr.Run(a='x' * 200)
+        self.assertEqual(len(r3.get_tag()), 100)
+        self.assertNotEqual(r3.get_tag(), mr.Run(a='x' * 201).get_tag())
+
+        # Test runs which only differ in characters unsafe for a file name have different tags
+        self.assertNotEqual(mr.Run(a='x/y').get_tag(), mr.Run(a='x:y').get_tag())
+        self.assertNotEqual(mr.Run(a='1 in 100').get_tag(), mr.Run(a='1-in-100').get_tag())
+
 
 class TestRunner(unittest.TestCase):
     def setUp(self):
@@ -239,6 +498,16 @@ class TestRunner(unittest.TestCase):
         self.assertEqual(list(r), [self.r1, self.r2, self.r3])
         self.assertEqual(list(r), [self.r1, self.r2, self.r3])
 
+        # Test membership
+        self.assertTrue(self.r2 in r)
+        self.assertTrue(mr.Run(a=4, b=5, c=6) in r)
+        self.assertFalse(mr.Run(a=4, b=5, c=7) in r)
+        self.assertFalse('a' in r)
+
+        # Test nested iteration
+        pairs = [(a, b) for a in r for b in r]
+        self.assertEqual(len(pairs), 9)
+
     def test_get_runs(self):
         # Test getting runs
         r: mr.Runner = mr.Runner(self.parameters)
@@ -285,6 +554,65 @@ class TestRunner(unittest.TestCase):
         runs = r.get_runs(15, any=False)
         self.assertEqual(runs, [])
 
+        # Test that the filter follows staging and removing runs
+        r5 = mr.Run(a=10, b=1, c=12)
+        r.stage(r5)
+        self.assertEqual(r.get_runs(10, any=False), [r4, r5])
+        r.remove_runs(r4)
+        self.assertEqual(r.get_runs(10, any=False), [r5])
+        self.assertEqual(r.get_runs(1), [self.r1, r5])
+        r.remove_runs(r5)
+        self.assertEqual(r.get_runs(12), [])
+        self.assertEqual(r.get_runs(1), [self.r1])
+
+    def test_staged_run_changed(self):
+        # Test a run changed after it was staged is still found, filtered and removed
+        r: mr.Runner = mr.Runner(self.parameters)
+        run = mr.Run(a=1, b=2, c=3)
+        r.stage([run, self.r2])
+        self.assertEqual(r.get_runs(1), [run])
+        run.a = 10
+        self.assertTrue(run in r)
+        self.assertEqual(r.get_runs(10), [run])
+        self.assertEqual(r.get_runs(1), [])
+        r.stage(mr.Run(a=10, b=2, c=3))
+        self.assertEqual(len(r), 2)
+        r.remove_runs(run)
+        self.assertFalse(run in r)
+        self.assertEqual(r.get_runs(), [self.r2])
+
+    def test_get_runs_unhashable(self):
+        # Test runs with unhashable values are staged and filtered, before and after the filter is first used
+        r: mr.Runner = mr.Runner(self.parameters)
+        r6 = mr.Run(a=[1], b=2, c=3)
+        r.stage(r6)
+        self.assertEqual(r.get_runs(2), [r6])
+        r7 = mr.Run(a=[4], b=5, c=6)
+        r.stage(r7)
+        self.assertEqual(len(r), 2)
+        self.assertEqual(r.get_runs(5), [r7])
+        self.assertEqual(r.get_runs(2, 5), [r6, r7])
+        r.remove_runs(r6)
+        self.assertEqual(r.get_runs(2), [])
+        self.assertEqual(len(r), 1)
+
+    def test_iter_runs(self):
+        r: mr.Runner = mr.Runner(self.parameters)
+        r.stage(self.r1)
+        r.stage(self.r2)
+        r.stage(self.r3)
+        r4 = mr.Run(a=1, b=10, c=11)
+        r.stage(r4)
+
+        # Test the generator is lazy and ordered
+        runs = r.iter_runs(1)
+        self.assertEqual(next(runs), self.r1)
+        self.assertEqual(list(runs), [r4])
+
+        # Test all runs are yielded without a filter
+        self.assertEqual(list(r.iter_runs()), [self.r1, self.r2, self.r3, r4])
+        self.assertEqual(list(r.iter_runs(1, 10, any=False)), [r4])
+
     def test_remove_runs(self):
         # Test removing runs
         r: mr.Runner = mr.Runner(self.parameters)
@@ -379,6 +707,110 @@ class TestRunner(unittest.TestCase):
         except FileNotFoundError:
             pass   
 
+    def test_command_cache(self):
+        calls = []
+        class MyRunner(mr.Runner):
+            def _build_command(self, parameters, run, flags, run_number):
+                calls.append(run)
+                return ['python', str(parameters.get_params()['x'])]
+
+        class MyParameters(mr.Parameters):
+            def get_run_args(self):
+                return ['a', 'b', 'c']
+
+        parameters = MyParameters(x=1)
+        runner = MyRunner(parameters)
+        runner.stage(self.r1)
+        
+        # Test the command is only built once
+        self.assertEqual(runner._command(self.r1, None, None), ['python', '1'])
+        self.assertEqual(runner._command(self.r1, None, None), ['python', '1'])
+        self.assertEqual(len(calls), 1)
+
+        # Test the cache is cleared when the parameters change
+        parameters.x = 2
+        self.assertEqual(runner._command(self.r1, None, None), ['python', '2'])
+        self.assertEqual(len(calls), 2)
+
+    def test_sigint(self):
+        class MyRunner(mr.Runner):
+            def _build_command(self, parameters, run, flags, run_number):
+                return ['python']
+        
+        # Test an interrupt stops every runner
+        r1 = MyRunner(self.parameters)
+        r2 = MyRunner(self.parameters)
+        mr._last_sigint = None
+        mr._sigint_handler(None, None)
+        self.assertTrue(r1._stop_event.is_set())
+        self.assertTrue(r2._stop_event.is_set())
+
+        # Test a repeated interrupt is ignored
+        r1._stop_event.clear()
+        mr._sigint_handler(None, None)
+        self.assertFalse(r1._stop_event.is_set())
+        mr._last_sigint = None
+
+        # Test runners are forgotten once they are no longer used
+        del r1, r2
+        self.assertEqual(len([r for r in mr._runners if isinstance(r, MyRunner)]), 0)
+
+        # Test the handler which was replaced is still called
+        calls = []
+        previous = mr._previous_sigint
+        signal.signal(signal.SIGINT, lambda signum, frame: calls.append(signum))
+        try:
+            r3 = MyRunner(self.parameters)
+            mr._sigint_handler(signal.SIGINT, None)
+            self.assertTrue(r3._stop_event.is_set())
+            self.assertEqual(calls, [signal.SIGINT])
+        finally:
+            signal.signal(signal.SIGINT, mr._sigint_handler)
+            mr._previous_sigint = previous
+            mr._last_sigint = None
+
+    def test_required_args_cache(self):
+        calls = []
+        class MyParameters(mr.Parameters):
+            def get_run_args(self):
+                calls.append(self)
+                return ['a', 'b', 'c'] if len(self.get_params()) == 0 else ['a', 'b']
+
+        parameters = MyParameters()
+        runner = mr.Runner(parameters)
+
+        # Test the required arguments are only fetched once
+        runner.stage(self.r1)
+        runner.stage([self.r2, self.r3])
+        self.assertEqual(len(calls), 1)
+
+        # Test the cache is cleared when the parameters change
+        parameters.x = 1
+        try:
+            runner.stage(mr.Run(a=1, b=2, c=4))
+            self.fail('Expected RunnerError')
+        except mr.RunnerError:
+            pass
+        runner.stage(mr.Run(a=1, b=2))
+        self.assertEqual(len(calls), 2)
+
+    def test_run_order(self):
+        class MyRunner(mr.Runner):
+            def _build_command(self, parameters, run, flags, run_number):
+                return ['python']
+
+        # Test runs are grouped by run number by default
+        runner = MyRunner(self.parameters)
+        runner.stage([self.r1, self.r2])
+        labels = runner.arguments('01', '02')[0]
+        self.assertEqual(labels, [f'{self.r1}_01', f'{self.r2}_01', f'{self.r1}_02', f'{self.r2}_02'])
+
+        # Test runs are grouped by run when warm start is off
+        parameters = mr.Parameters(self.parameters, warm_start=False)
+        runner.__dict__['_parameters'] = parameters
+        labels = runner.arguments('01', '02')[0]
+        self.assertEqual(labels, [f'{self.r1}_01', f'{self.r1}_02', f'{self.r2}_01', f'{self.r2}_02'])
+
     def test_runner_indexing(self):
         parameters = self.parameters
         runner = mr.Runner(parameters)
@@ -420,7 +852,7 @@ class TestRunner(unittest.TestCase):
         runner.run()
 
         # Check if the file exists
-        for filename in ['run_NA_[1, 2, 3].out', 'run_NA_[4, 5, 6].out']:
+        for filename in [f'run_NA_{run1.get_tag()}.out', f'run_NA_{run2.get_tag()}.out']:
             file_path = os.path.join(folder_path, filename)
             if os.path.isfile(file_path):
                 self.assertTrue(True)
@@ -430,7 +862,7 @@ class TestRunner(unittest.TestCase):
         # Remove files that start with "run_NA_"
         folder_path = os.getcwd()
         for filename in os.listdir(folder_path):
-            if filename.startswith('run_NA_['):
+            if filename.startswith('run_NA_'):
                 file_path = os.path.join(folder_path, filename)
                 os.remove(file_path)
 
@@ -440,7 +872,7 @@ class TestRunner(unittest.TestCase):
         runner.run()
 
         # Check if the file exists in the correct location
-        for filename in ['run_NA_[1, 2, 3].out', 'run_NA_[4, 5, 6].out']:
+        for filename in [f'run_NA_{run1.get_tag()}.out', f'run_NA_{run2.get_tag()}.out']:
             file_path = os.path.join(folder_path, filename)
             if os.path.isfile(file_path):
                 self.assertTrue(True)
@@ -448,6 +880,23 @@ class TestRunner(unittest.TestCase):
             else:
                 self.fail('Expected file to be created')
 
+        # Test a failing run points to its output file
+        def _fail_build(self, parameters: mr.Parameters, run: mr.Run, *flags: list[str]) -> list[str]:
+            return ['python', '-c', 'import sys; sys.stderr.write("bad input"); sys.exit(3)']
+
+        runner._build_command = _fail_build.__get__(runner, MyRunner)
+        runner.remove_runs(run2)
+        try:
+            runner.run()
+            self.fail('Expected RunnerError')
+        except mr.RunnerError as e:
+            self.assertIn(os.path.join(folder_path, f'run_NA_{run1.get_tag()}.out'), str(e))
+            self.assertIn(f'{run1}_None', str(e))
+            self.assertIn('bad input', str(e))
+            os.remove(os.path.join(folder_path, f'run_NA_{run1.get_tag()}.out'))
+        runner.stage(run2)
+        runner._build_command = MyRunner._build_command.__get__(runner, MyRunner)
+
         parameters = MyParameters(async_runs=2, stdout=r'./tests/stdout/noexist')
         runner.__dict__['_parameters'] = parameters
         try:
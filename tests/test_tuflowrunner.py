@@ -1,5 +1,7 @@
 import unittest
 import os
+import copy
+import tempfile
 import simrunner.tuflow as mr
 
 class TestParameters(unittest.TestCase):
@@ -28,6 +30,68 @@ class TestParameters(unittest.TestCase):
         except FileNotFoundError:
             pass
 
+    def test_get_tcf_cached(self):
+        # Test the tcf is cached for the run number
+        p: mr.Parameters = mr.Parameters(root=r"tests\data\tuflow\one_tcf", engine=None, version=None, exec_path=None)
+        test_path = os.path.realpath(r"tests\data\tuflow\one_tcf\model_~s1~_~e1~_~e2~.tcf")
+        self.assertEqual(p.get_tcf(""), test_path)
+        self.assertEqual(p._tcfs, {"": test_path})
+
+        # Test the cache is kept when unrelated parameters change
+        tcf_files = p._find_tcfs()
+        p.flags = ["-x"]
+        self.assertIs(p._find_tcfs(), tcf_files)
+        self.assertEqual(p._tcfs, {"": test_path})
+
+        # Test a relative root is searched again when the working directory changes
+        cwd = os.getcwd()
+        os.chdir("tests")
+        try:
+            self.assertIsNone(p._find_tcfs())
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(p.get_tcf(""), test_path)
+
+        # Test the cache is cleared when the parameters change
+        p.root = r"tests\data\tuflow\no_tcf"
+        try:
+            p.get_tcf("")
+            self.fail('Expected FileNotFoundError')
+        except FileNotFoundError:
+            pass
+
+    def test_invalidate_tcf_cache(self):
+        # Test the tcf files are searched for again after invalidating
+        p: mr.Parameters = mr.Parameters(root=r"tests\data\tuflow\one_tcf", engine=None, version=None, exec_path=None)
+        tcf_files = p._find_tcfs()
+        self.assertIs(p._find_tcfs(), tcf_files)
+        p.invalidate_tcf_cache()
+        self.assertIsNot(p._find_tcfs(), tcf_files)
+        self.assertEqual(p._find_tcfs(), tcf_files)
+        self.assertEqual(p._tcfs, {})
+
+    def test_copy(self):
+        # Test a copy does not share the parameters or the tcf cache with the original
+        p: mr.Parameters = mr.Parameters(root=r"tests\data\tuflow\one_tcf", engine="SP", version="2020", exec_path=None)
+        test_path = os.path.realpath(r"tests\data\tuflow\one_tcf\model_~s1~_~e1~_~e2~.tcf")
+        self.assertEqual(p.get_tcf(""), test_path)
+        p_copy: mr.Parameters = copy.copy(p)
+        self.assertEqual(p_copy._tcfs, {})
+        self.assertIsNone(p_copy._tcf_files)
+        p_copy.engine = "DP"
+        self.assertEqual(p.engine, "SP")
+        self.assertEqual(vars(p_copy)["engine"], "DP")
+        self.assertEqual(p_copy.get_tcf(""), test_path)
+        self.assertIsNot(p_copy._tcfs, p._tcfs)
+
+    def test_find_nested_tcf(self):
+        # Test tcf files are found below the root when there are none in the root, 
+        # the results directory is not searched
+        p: mr.Parameters = mr.Parameters(root=r"tests\data\tuflow\nested_tcf", engine=None, version=None, exec_path=None)
+        test_path = os.path.realpath(r"tests\data\tuflow\nested_tcf\runs\model_~s1~_~e1~_~e2~.tcf")
+        self.assertEqual(p._find_tcfs(), [test_path])
+        self.assertEqual(p.get_run_args(), ["s1", "e1", "e2"])
+
     def test_not_all_required(self):
         # Test with missing parameters
         try:
@@ -44,6 +108,20 @@ class TestParameters(unittest.TestCase):
                                          engine=r"DP")
         test_path = os.path.realpath(r"tests\data\tuflow\executables\2020-10-AD\TUFLOW_iDP_w64.exe")
         self.assertEqual(p.executable(), test_path)
+
+        # Test the cached path follows changes to the parameters
+        p.engine = r"SP"
+        test_path = os.path.realpath(r"tests\data\tuflow\executables\2020-10-AD\TUFLOW_iSP_w64.exe")
+        self.assertEqual(p.executable(), test_path)
+
+        # Test a relative path follows changes to the working directory
+        cwd = os.getcwd()
+        os.chdir("tests")
+        try:
+            self.assertEqual(p.executable(), os.path.join(cwd, "tests", os.path.relpath(test_path, cwd)))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(p.executable(), test_path)
         
         # Test with invalid engine
         p: mr.Parameters = mr.Parameters(p, engine=r"invalid")
@@ -62,6 +140,12 @@ class TestParameters(unittest.TestCase):
         test_tokens = ["s1", "e1", "e2"]
         self.assertEqual(p.get_run_args(), test_tokens)
 
+        # Test unpaired and adjacent ~ in the file name
+        self.assertEqual(p._Parameters__get_argument_tokens("model_~s1~_~e1~_~.tcf"), ["s1", "e1"])
+        self.assertEqual(p._Parameters__get_argument_tokens("model_~s1~~e1~.tcf"), ["s1", "e1"])
+        self.assertEqual(p._Parameters__get_argument_tokens("model.tcf"), [])
+        self.assertEqual(p._Parameters__get_argument_tokens("m_~~a~.tcf"), ["a"])
+
     def test_group_id(self):
         # Test basic creation
         p: mr.Parameters = mr.Parameters(exec_path=r"tests\data\tuflow\executables",
@@ -89,6 +173,12 @@ class TestRun(unittest.TestCase):
         test_tokens = ["-a", "1", "-b", "2", "-c", "3"]
         self.assertEqual(r.run_args(), test_tokens)
 
+        # Test the cached arguments follow changes to the run
+        r.run_args().append("-d")
+        self.assertEqual(r.run_args(), test_tokens)
+        r.a = '4'
+        self.assertEqual(r.run_args(), ["-a", "4", "-b", "2", "-c", "3"])
+
 class TestRunner(unittest.TestCase):
     def setUp(self) -> None:
         return super().setUp()
@@ -109,6 +199,27 @@ class TestRunner(unittest.TestCase):
         
         self.assertEqual(runner._build_command(p, r, ["-b"], ""), test_tokens)
 
+    def test_command_after_invalidate(self):
+        # Test the runner launches the new tcf file after the tcf cache is invalidated
+        with tempfile.TemporaryDirectory() as root:
+            old_tcf = os.path.join(root, "m_~a~_01.tcf")
+            new_tcf = os.path.join(root, "n_~a~_01.tcf")
+            open(old_tcf, "w").close()
+            p: mr.Parameters = mr.Parameters(exec_path=r"tests\data\tuflow\executables",
+                                             root=root,
+                                             version=r"2020-10-AD",
+                                             engine=r"DP")
+            runner = mr.Runner(p)
+            runner.stage(mr.Run(a='1'))
+            _, simulations, _, _ = runner.arguments("01")
+            self.assertEqual(simulations[0]._command[-1], os.path.realpath(old_tcf))
+
+            os.rename(old_tcf, new_tcf)
+            p.invalidate_tcf_cache()
+            self.assertEqual(p.get_tcf("01"), os.path.realpath(new_tcf))
+            _, simulations, _, _ = runner.arguments("01")
+            self.assertEqual(simulations[0]._command[-1], os.path.realpath(new_tcf))
+
     def test_real(self):
         p: mr.Parameters = mr.Parameters(exec_path=r"C:\Program Files\TUFLOW",
                                          root=r"tests\data\tuflow\one_tcf",